@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+"""Measures how lizardfs-cgiserver handles big request and response bodies.
+
+Three transfers are timed for each size: a POST whose body is read by a CGI
+script, a CGI response of that size and a static file of that size. Buffering
+which copies the whole received or pending data for each recv() or send()
+makes the time grow quadratically with the size instead of linearly.
+
+To see the difference against an older version of the server pass its source,
+e.g.:
+  git show HEAD~1:src/cgi/lizardfs-cgiserver.py.in > /tmp/old-cgiserver.py.in
+  ./bench_buffers.py --baseline /tmp/old-cgiserver.py.in
+"""
+
+import argparse
+import http.client
+import os
+import time
+from typing import Dict, List, Optional
+
+from cgi_bench_common import CGIServerProcess, ConfiguredTree
+
+# Reads the request body and sends back its size followed by QUERY_STRING bytes
+ECHO_SCRIPT = '''#!/usr/bin/env python3
+def cgi_main(environ, stdin, stdout):
+    received = len(stdin.read())
+    size = int(environ.get("QUERY_STRING") or 0)
+    stdout.write(b"Content-Type: application/octet-stream\\r\\n\\r\\n")
+    stdout.write(b"%d\\n" % received)
+    block = bytes(65536)
+    while size > 0:
+        stdout.write(block[:size])
+        size -= len(block)
+'''
+
+MIB = 1 << 20
+
+
+def prepare(tree: ConfiguredTree, sizes: List[int]) -> None:
+    path = os.path.join(tree.root, "echo.cgi")
+    with open(path, "w") as f:
+        f.write(ECHO_SCRIPT)
+    os.chmod(path, 0o755)
+    for size in sizes:
+        with open(os.path.join(tree.root, "file%u.bin" % size), "wb") as f:
+            f.write(os.urandom(size * MIB))
+
+
+def timed_request(port: int, method: str, path: str, body: Optional[bytes] = None) -> float:
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    start = time.perf_counter()
+    connection.request(method, path, body=body)
+    response = connection.getresponse()
+    while response.read(MIB):
+        pass
+    elapsed = time.perf_counter() - start
+    connection.close()
+    return elapsed
+
+
+def measure(tree: ConfiguredTree, sizes: List[int], repeat: int) -> Dict[str, List[float]]:
+    """Returns the best time of each transfer for each size"""
+    results: Dict[str, List[float]] = {"POST": [], "CGI": [], "static": []}
+    server = CGIServerProcess(tree)
+    try:
+        for size in sizes:
+            body = bytes(size * MIB)
+            requests = {
+                "POST": ("POST", "/echo.cgi", body),
+                "CGI": ("GET", "/echo.cgi?%u" % (size * MIB), None),
+                "static": ("GET", "/file%u.bin" % size, None),
+            }
+            for name, (method, path, data) in requests.items():
+                results[name].append(min(
+                    timed_request(server.port, method, path, data) for _ in range(repeat)))
+    finally:
+        server.stop()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 16], help="sizes in MiB")
+    parser.add_argument("--repeat", type=int, default=3, help="transfers of each size, the best is reported")
+    parser.add_argument("--baseline", help="lizardfs-cgiserver.py.in to compare with")
+    args = parser.parse_args()
+
+    variants = [("current", None)]
+    if args.baseline:
+        variants.append(("baseline", args.baseline))
+    print("%-10s %-8s %8s %10s %10s" % ("server", "transfer", "MiB", "ms", "MiB/s"))
+    for variant, source in variants:
+        tree = ConfiguredTree(source)
+        try:
+            prepare(tree, args.sizes)
+            results = measure(tree, args.sizes, args.repeat)
+        finally:
+            tree.cleanup()
+        for name, times in results.items():
+            for size, elapsed in zip(args.sizes, times):
+                print("%-10s %-8s %8d %10.1f %10.1f" % (
+                    variant, name, size, 1000 * elapsed, size / elapsed))
+
+
+if __name__ == "__main__":
+    main()
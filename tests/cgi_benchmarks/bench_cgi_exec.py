@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+"""Compares latency of CGI requests served by lizardfs-cgiserver in the
+persistent mode (scripts loaded once, cgi_main called per request) with the
+classic mode (-E, scripts executed from scratch for every request).
+
+Before scripts were kept in memory the server compiled them for every
+request; the cost of that compilation is reported separately.
+
+Only CLTOMA_INFO and CUTOAN_CHART are answered by the fake master, so the
+measured time is dominated by the work done by the server and the scripts
+themselves, not by data processing.
+"""
+
+import argparse
+import os
+import struct
+import time
+from typing import List
+
+from cgi_bench_common import (
+    PROTO_BASE,
+    CGIServerProcess,
+    ConfiguredTree,
+    FakeServer,
+    percentiles,
+    reply,
+)
+
+CLTOMA_INFO = PROTO_BASE + 510
+MATOCL_INFO = PROTO_BASE + 511
+CUTOAN_CHART = PROTO_BASE + 504
+ANTOCU_CHART = PROTO_BASE + 505
+
+MASTER_VERSION = (3, 13, 0)
+
+
+def master_handler(command: int, payload: bytes):
+    if command == CLTOMA_INFO:
+        # 68 bytes long reply, the first 4 bytes carry the version
+        return reply(MATOCL_INFO, struct.pack(">HBB", *MASTER_VERSION) + bytes(64))
+    if command == CUTOAN_CHART:
+        return reply(ANTOCU_CHART, b"GIF89a" + bytes(1024))
+    return None
+
+
+def measure(server: CGIServerProcess, path: str, requests: int, warmup: int) -> List[float]:
+    for _ in range(warmup):
+        server.get(path)
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        server.get(path)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def compile_time(file_name: str, repeat: int) -> float:
+    with open(file_name, "rb") as f:
+        source = f.read()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        compile(source, file_name, "exec")
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per page")
+    parser.add_argument("--warmup", type=int, default=10, help="requests done before measuring")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="delay of each master reply in seconds"
+    )
+    args = parser.parse_args()
+
+    master = FakeServer(master_handler, latency=args.latency)
+    tree = ConfiguredTree()
+    pages = [
+        "mfs.cgi?masterhost=127.0.0.1&masterport=%u&sections=HELP" % master.port,
+        "chart.cgi?host=127.0.0.1&port=%u&id=100" % master.port,
+    ]
+    try:
+        print("%-10s %-10s %10s %10s %10s %10s" % ("mode", "script", "req/s", "mean ms", "p50 ms", "p99 ms"))
+        for mode, options in (("persistent", []), ("exec", ["-E"])):
+            server = CGIServerProcess(tree, options)
+            try:
+                for page in pages:
+                    samples = measure(server, page, args.requests, args.warmup)
+                    p = percentiles(samples)
+                    print("%-10s %-10s %10.1f %10.3f %10.3f %10.3f" % (
+                        mode, page.split("?")[0], len(samples) / sum(samples),
+                        1000 * sum(samples) / len(samples), 1000 * p[50], 1000 * p[99]))
+            finally:
+                server.stop()
+        for page in pages:
+            script = page.split("?")[0]
+            print("compiling %s once takes %.3f ms" % (
+                script, 1000 * compile_time(os.path.join(tree.root, script), 20)))
+    finally:
+        tree.cleanup()
+        master.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+"""Micro-benchmark of the deserialization framework of mfs.cgi.
+
+Synthetic replies with lists of 100k entries are decoded with the current
+framework and with the previous implementation, which removed every decoded
+field from the front of the buffer (kept below for comparison).
+"""
+
+import argparse
+import struct
+import time
+import warnings
+from typing import Callable, Dict, List, Tuple
+
+from cgi_bench_common import ConfiguredTree
+
+
+# The previous implementation of the framework, for comparison
+
+
+def legacy_deserialize(buffer, tree, return_tuple=False):
+    head_len = 2
+    if tree[0] == "primitive":
+        head = legacy_deserialize_primitive(buffer, tree[1])
+    elif tree[0] == "tuple":
+        head = legacy_deserialize_tuple(buffer, tree[1])
+    elif tree[0] == "string":
+        head = legacy_deserialize_string(buffer)
+        head_len = 1
+    elif tree[0] == "list":
+        head = legacy_deserialize_list(buffer, tree[1])
+    elif tree[0] == "dict":
+        head = legacy_deserialize_dict(buffer, tree[1], tree[2])
+        head_len = 3
+    else:
+        raise RuntimeError("Unknown tree to deserialize: {0}".format(tree))
+    if len(tree) > head_len:
+        tail = legacy_deserialize(buffer, tree[head_len:], True)
+        return (head,) + tail
+    return (head,) if return_tuple else head
+
+
+def legacy_deserialize_primitive(buffer, format):
+    ret, = legacy_deserialize_tuple(buffer, format)
+    return ret
+
+
+def legacy_deserialize_tuple(bytebuffer, format):
+    size = struct.calcsize(">" + format)
+    ret = struct.unpack_from(">" + format, memoryview(bytebuffer))
+    del bytebuffer[0:size]
+    return ret
+
+
+def legacy_deserialize_string(buffer):
+    length = legacy_deserialize_primitive(buffer, "L")
+    if len(buffer) < length or buffer[length - 1] != 0:
+        raise RuntimeError("malformed message; cannot deserialize")
+    ret = str(buffer[0:length - 1], "utf-8")
+    del buffer[0:length]
+    return ret
+
+
+def legacy_deserialize_list(buffer, element_tree):
+    length = legacy_deserialize_primitive(buffer, "L")
+    return [legacy_deserialize(buffer, element_tree) for i in range(length)]
+
+
+def legacy_deserialize_dict(buffer, key_tree, value_tree):
+    length = legacy_deserialize_primitive(buffer, "L")
+    ret = {}
+    for i in range(length):
+        key = legacy_deserialize(buffer, key_tree)
+        ret[key] = legacy_deserialize(buffer, value_tree)
+    return ret
+
+
+def string(text: str) -> bytes:
+    data = text.encode("utf-8") + b"\0"
+    return struct.pack(">L", len(data)) + data
+
+
+def make_cases(mfs: Dict[str, object], entries: int) -> List[Tuple[str, object, bytes]]:
+    """Returns (description, tree, serialized data) of the benchmarked messages"""
+    List, Tuple, Primitive, Dict, String = (
+        mfs["List"], mfs["Tuple"], mfs["Primitive"], mfs["Dict"], mfs["String"])
+    count = struct.pack(">L", entries)
+    return [
+        ("List(Tuple('LHHBB'))", List(Tuple("LHHBB")),
+         count + b"".join(struct.pack(">LHHBB", i, i % 65536, 9421, 3, 13) for i in range(entries))),
+        ("List(Primitive('H') + 2 * String)", List(Primitive("H") + 2 * String),
+         count + b"".join(struct.pack(">H", i % 65536) + string("goal%u" % i) + string("2*_")
+                          for i in range(entries))),
+        ("Dict(Primitive('Q'), Tuple(11 * 'Q'))", Dict(Primitive("Q"), Tuple(11 * "Q")),
+         count + b"".join(struct.pack(">Q11Q", i, *range(11)) for i in range(entries))),
+        ("List(List(String))", List(List(String)),
+         count + b"".join(struct.pack(">L", 2) + string("a%u" % i) + string("b") for i in range(entries))),
+    ]
+
+
+def measure(function: Callable[[bytearray], object], data: bytes, repeat: int) -> Tuple[float, object]:
+    best = None
+    result = None
+    for _ in range(repeat):
+        buffer = bytearray(data)
+        start = time.perf_counter()
+        result = function(buffer)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=100000, help="number of list entries")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each case, the best is reported")
+    parser.add_argument("--skip-legacy", action="store_true",
+                        help="don't run the previous implementation (it is quadratic)")
+    args = parser.parse_args()
+
+    tree = ConfiguredTree()
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            mfs = tree.load_script("mfs.cgi")
+    finally:
+        tree.cleanup()
+    deserialize = mfs["deserialize"]
+
+    print("%-40s %10s %12s %12s" % ("tree", "size MiB", "current ms", "previous ms"))
+    for description, schema, data in make_cases(mfs, args.entries):
+        current, result = measure(lambda buffer: deserialize(buffer, schema), data, args.repeat)
+        if args.skip_legacy:
+            previous = "-"
+        else:
+            elapsed, expected = measure(lambda buffer: legacy_deserialize(buffer, schema), data, 1)
+            if expected != result:
+                raise RuntimeError("results differ for %s" % description)
+            previous = "%.1f" % (1000 * elapsed)
+        print("%-40s %10.1f %12.1f %12s" % (description, len(data) / 2 ** 20, 1000 * current, previous))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/python3
+"""Measures how lizardfs-cgiserver copes with many idle keep-alive connections.
+
+For each requested count the server is started, the connections are opened
+and each of them sends one keep-alive request and reads the reply, so that
+all of them are idle keep-alive connections registered in the server's event
+loop. Then latency of requests sent over one more connection is measured,
+together with the resident memory of the server.
+
+The server has to be allowed to open enough files (see ulimit -n), it raises
+its soft limit to the hard one.
+"""
+
+import argparse
+import resource
+import socket
+import time
+from typing import List, Tuple
+
+from cgi_bench_common import CGIServerProcess, ConfiguredTree, percentiles, server_rss_kib
+
+REQUEST = b"GET /favicon.ico HTTP/1.1\r\nHost: localhost\r\nConnection: keep-alive\r\n\r\n"
+
+
+def read_response(connection: socket.socket) -> None:
+    """Reads one response framed with Content-Length"""
+    data = b""
+    while b"\r\n\r\n" not in data:
+        chunk = connection.recv(65536)
+        if not chunk:
+            raise EOFError("connection closed by the server")
+        data += chunk
+    headers, body = data.split(b"\r\n\r\n", 1)
+    length = 0
+    for line in headers.split(b"\r\n")[1:]:
+        name, value = line.split(b":", 1)
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    while len(body) < length:
+        chunk = connection.recv(65536)
+        if not chunk:
+            raise EOFError("connection closed by the server")
+        body += chunk
+
+
+def open_idle_connections(port: int, count: int) -> List[socket.socket]:
+    connections = []
+    for _ in range(count):
+        connection = socket.create_connection(("127.0.0.1", port))
+        connection.sendall(REQUEST)
+        read_response(connection)
+        connections.append(connection)
+    return connections
+
+
+def measure(port: int, requests: int) -> Tuple[float, List[float]]:
+    connection = socket.create_connection(("127.0.0.1", port))
+    samples = []
+    start = time.perf_counter()
+    for _ in range(requests):
+        request_start = time.perf_counter()
+        connection.sendall(REQUEST)
+        read_response(connection)
+        samples.append(time.perf_counter() - request_start)
+    elapsed = time.perf_counter() - start
+    connection.close()
+    return requests / elapsed, samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--connections", type=int, nargs="+", default=[1000, 5000, 10000],
+        help="numbers of idle connections to test",
+    )
+    parser.add_argument("--requests", type=int, default=1000, help="measured requests")
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if max(args.connections) + 64 > hard:
+        parser.error("open files limit (%d) is too low for %d connections" % (
+            hard, max(args.connections)))
+
+    tree = ConfiguredTree()
+    try:
+        print("%-8s %10s %10s %10s %10s %10s" % (
+            "idle", "setup s", "req/s", "p50 ms", "p99 ms", "RSS MiB"))
+        for count in args.connections:
+            server = CGIServerProcess(tree)
+            try:
+                setup_start = time.perf_counter()
+                connections = open_idle_connections(server.port, count)
+                setup = time.perf_counter() - setup_start
+                throughput, samples = measure(server.port, args.requests)
+                p = percentiles(samples)
+                print("%-8d %10.2f %10.1f %10.3f %10.3f %10.1f" % (
+                    count, setup, throughput, 1000 * p[50], 1000 * p[99],
+                    server_rss_kib(server.process.pid) / 1024))
+                for connection in connections:
+                    connection.close()
+            finally:
+                server.stop()
+    finally:
+        tree.cleanup()
+
+
+if __name__ == "__main__":
+    main()
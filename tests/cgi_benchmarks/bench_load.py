@@ -0,0 +1,188 @@
+#!/usr/bin/python3
+"""Load test of lizardfs-cgiserver with mfs.cgi and chart.cgi against a fake cluster.
+
+A fake master and fake chunkservers (see FakeCluster) describe a synthetic
+cluster of the given size and answer each request after the given latency.
+lizardfs-cgiserver is started as a separate process and every page (each
+section of mfs.cgi, a page of several sections, the JSON and Prometheus
+outputs and charts) is requested by concurrent keep-alive clients for the
+given time. For each page the throughput, p50 and p99 latency, errors and
+the resident memory of the server after the test (and its peak so far) are
+reported.
+
+mfs.cgi caches replies of the servers for a few seconds (the list of exports
+for 30 seconds), as in production, so most requests show the cost of
+rendering and the latency of the servers shows up in the tail. Chunkservers
+and mounts of the synthetic cluster have the address 127.0.0.1, whose name is
+found without asking DNS; with --distinct-addresses each of them has its own
+address and pages include reverse DNS lookups, which mfs.cgi caches for a
+minute but which may be slow for thousands of addresses.
+
+To catch regressions compare the numbers of two versions, e.g.:
+  git show HEAD~1:src/cgi/mfs.cgi.in > /tmp/old-mfs.cgi.in
+  ./bench_load.py --baseline /tmp/old-mfs.cgi.in
+which runs the same load against both versions of mfs.cgi served by one
+server.
+"""
+
+import argparse
+import http.client
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from cgi_bench_common import (
+    CHARTS_CSV_CHARTID_BASE,
+    CGIServerProcess,
+    ConfiguredTree,
+    FakeCluster,
+    percentiles,
+    server_rss_kib,
+)
+
+# Pages requested from mfs.cgi: name and the query, without the address of the master
+MFS_PAGES = [
+    ("IN", "sections=IN"),
+    ("CH", "sections=CH"),
+    ("CS", "sections=CS"),
+    ("HD", "sections=HD"),
+    ("EX", "sections=EX"),
+    ("MS", "sections=MS"),
+    ("MO", "sections=MO"),
+    ("MC", "sections=MC"),
+    ("CC", "sections=CC"),
+    ("all", "sections=IN%7CCH%7CCS%7CHD%7CEX%7CMS%7CMO"),
+    ("json", "format=json&sections=IN%7CCH%7CCS%7CHD%7CMS"),
+    ("prometheus", "format=prometheus"),
+]
+
+
+def chart_pages(port: int) -> List[Tuple[str, str]]:
+    """Pages of chart.cgi showing charts of the fake master"""
+    return [
+        ("chart", "chart.cgi?host=127.0.0.1&port=%u&id=100" % port),
+        ("charts", "chart.cgi?host=127.0.0.1&port=%u&ids=%s" % (port, ",".join(str(i) for i in range(100, 116)))),
+        ("csv", "chart.cgi?host=127.0.0.1&port=%u&id=%u&format=json" % (port, CHARTS_CSV_CHARTID_BASE + 1000)),
+    ]
+
+
+class Client(threading.Thread):
+    """Sends requests for the path over one keep-alive connection until the deadline"""
+
+    def __init__(self, port: int, path: str, deadline: float) -> None:
+        super().__init__(daemon=True)
+        self.port = port
+        self.path = path
+        self.deadline = deadline
+        self.samples: List[float] = []
+        self.errors = 0
+        self.received = 0
+
+    def run(self) -> None:
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+        while time.perf_counter() < self.deadline:
+            start = time.perf_counter()
+            try:
+                connection.request("GET", "/" + self.path, headers={"Accept-Encoding": "gzip"})
+                response = connection.getresponse()
+                self.received += len(response.read())
+                if response.status != 200:
+                    self.errors += 1
+                if response.will_close:
+                    connection.close()
+            except (OSError, http.client.HTTPException):
+                self.errors += 1
+                connection.close()
+                continue
+            self.samples.append(time.perf_counter() - start)
+        connection.close()
+
+
+def warm_up(port: int, path: str, requests: int) -> None:
+    """Fills caches of the server and the scripts before the page is measured"""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    for _ in range(requests):
+        connection.request("GET", "/" + path)
+        connection.getresponse().read()
+    connection.close()
+
+
+def run_load(port: int, path: str, clients: int, duration: float) -> Dict[str, float]:
+    deadline = time.perf_counter() + duration
+    threads = [Client(port, path, deadline) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    samples = [sample for thread in threads for sample in thread.samples]
+    p = percentiles(samples) if samples else {50: 0.0, 99: 0.0}
+    return {
+        "requests": len(samples),
+        "errors": sum(thread.errors for thread in threads),
+        "throughput": len(samples) / elapsed,
+        "p50": p[50],
+        "p99": p[99],
+        "size": sum(thread.received for thread in threads) / max(1, len(samples)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunkservers", type=int, default=1000, help="chunkservers listed by the master")
+    parser.add_argument("--disk-servers", type=int, default=20, help="fake chunkservers asked for their disks")
+    parser.add_argument("--disks", type=int, default=24, help="disks of each fake chunkserver")
+    parser.add_argument("--sessions", type=int, default=2000, help="mounts (sessions) of the master")
+    parser.add_argument("--exports", type=int, default=200, help="entries of the exports list")
+    parser.add_argument("--version", default="3.13.0", help="version reported by the master")
+    parser.add_argument("--distinct-addresses", action="store_true",
+                        help="give chunkservers and mounts addresses from 10.0.0.0/8 instead of 127.0.0.1")
+    parser.add_argument("--latency", type=float, default=0.0, help="delay of each reply of the fake servers in seconds")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent connections")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of load for each page")
+    parser.add_argument("--warmup", type=int, default=3, help="requests for each page done before measuring")
+    parser.add_argument("--pages", nargs="+", help="names of pages to test (default: all)")
+    parser.add_argument("--server-options", default="", help="additional options of lizardfs-cgiserver, e.g. \"-w 8\"")
+    parser.add_argument("--baseline", help="mfs.cgi.in to compare with")
+    args = parser.parse_args()
+
+    version = tuple(int(part) for part in args.version.split("."))
+    cluster = FakeCluster(args.chunkservers, args.disks, args.sessions, args.exports, version,  # type: ignore
+                          args.distinct_addresses)
+    cluster.start(args.disk_servers, args.latency)
+    assert cluster.master is not None
+    master = "masterhost=127.0.0.1&masterport=%u" % cluster.master.port
+
+    tree = ConfiguredTree()
+    scripts = {"current": "mfs.cgi"}
+    if args.baseline:
+        tree.add_script("mfs-baseline.cgi", args.baseline)
+        scripts["baseline"] = "mfs-baseline.cgi"
+    pages = [(variant, name, "%s?%s&%s" % (script, master, query))
+             for name, query in MFS_PAGES for variant, script in scripts.items()]
+    pages += [("current", name, path) for name, path in chart_pages(cluster.master.port)]
+    if args.pages:
+        pages = [page for page in pages if page[1] in args.pages]
+
+    server = CGIServerProcess(tree, args.server_options.split())
+    try:
+        print("%-10s %-10s %8s %6s %9s %9s %9s %9s %9s %9s" % (
+            "script", "page", "requests", "errors", "req/s", "p50 ms", "p99 ms", "KiB", "RSS MiB", "peak MiB"))
+        for variant, name, path in pages:
+            warm_up(server.port, path, args.warmup)
+            result = run_load(server.port, path, args.clients, args.duration)
+            print("%-10s %-10s %8d %6d %9.1f %9.2f %9.2f %9.1f %9.1f %9.1f" % (
+                variant, name, result["requests"], result["errors"], result["throughput"],
+                1000 * result["p50"], 1000 * result["p99"], result["size"] / 1024,
+                server_rss_kib(server.process.pid) / 1024,
+                server_rss_kib(server.process.pid, "VmHWM") / 1024))
+    finally:
+        server.stop()
+        tree.cleanup()
+        cluster.close()
+
+
+if __name__ == "__main__":
+    main()
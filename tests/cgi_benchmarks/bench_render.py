@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+"""Measures how long mfs.cgi takes to render its big tables.
+
+A fake master (and fake chunkservers for the list of disks) answers with
+synthetic data of the given number of rows: chunkservers (CS), disks (HD),
+exports (EX) and mounts (ML, MS, MO). Each section is rendered directly by its
+render_* function, all of its rows at once and with host names equal to IPs,
+so that the time is spent on processing the replies and generating markup.
+
+Pass an older version of mfs.cgi.in to compare the time with it and to check
+that both versions generate exactly the same page, e.g.:
+  git show HEAD~1:src/cgi/mfs.cgi.in > /tmp/old-mfs.cgi.in
+  ./bench_render.py --baseline /tmp/old-mfs.cgi.in
+"""
+
+import argparse
+import cgi
+import gc
+import io
+import time
+import warnings
+from typing import Callable, Dict, Tuple
+
+from cgi_bench_common import ConfiguredTree, FakeCluster
+
+# A version with labels of chunkservers and quotas, but without the list of
+# shadow masters
+MASTER_VERSION = (2, 5, 4)
+# The table of mounts "ML" is shown only for such old masters
+OLD_MASTER_VERSION = (1, 5, 13)
+DISKS_PER_SERVER = 100
+
+
+# Section, its render function and whether it needs the old master
+SECTIONS = [
+    ("CS", "render_servers", False),
+    ("HD", "render_disks", False),
+    ("EX", "render_config", False),
+    ("ML", "render_mount_list", True),
+    ("MS", "render_mounts", False),
+    ("MO", "render_operations", False),
+]
+
+
+def renderer(mfs: Dict[str, object], name: str, port: int, version: Tuple[int, int, int]) -> Callable[[], str]:
+    """Returns a function which renders the section and returns the generated markup"""
+
+    class Context(mfs["RequestContext"]):  # type: ignore
+        def hostname(self, ip: str) -> str:
+            return ip
+
+    query = "masterhost=127.0.0.1&masterport=%u&sections=%s&%slimit=0" % (port, name, name)
+    render = mfs[dict((s, f) for s, f, _ in SECTIONS)[name]]
+
+    def run() -> str:
+        out = io.StringIO()
+        ctx = Context(cgi.FieldStorage(environ={"REQUEST_METHOD": "GET", "QUERY_STRING": query}), out)
+        ctx.masterversion = version
+        render(ctx)
+        return out.getvalue()
+    return run
+
+
+def best_time(run: Callable[[], str], repeat: int) -> Tuple[float, str]:
+    result = run()  # fills caches of replies and connections
+    best = None
+    for _ in range(repeat):
+        # like timeit, without collections of garbage started at random moments
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            result = run()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="rows of each table")
+    parser.add_argument("--repeat", type=int, default=5, help="renderings of each section, the best is reported")
+    parser.add_argument("--baseline", help="mfs.cgi.in to compare with")
+    parser.add_argument("--sections", nargs="+", default=[s for s, _, _ in SECTIONS])
+    args = parser.parse_args()
+
+    cluster = FakeCluster(args.rows, DISKS_PER_SERVER, args.rows, args.rows, MASTER_VERSION)
+    cluster.start((args.rows + DISKS_PER_SERVER - 1) // DISKS_PER_SERVER)
+    old_cluster = FakeCluster(0, 0, args.rows, 0, OLD_MASTER_VERSION)
+    old_cluster.start(0)
+
+    tree = ConfiguredTree()
+    try:
+        scripts = {"current": "mfs.cgi"}
+        if args.baseline:
+            tree.add_script("mfs-baseline.cgi", args.baseline)
+            scripts["baseline"] = "mfs-baseline.cgi"
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            loaded = {variant: tree.load_script(name) for variant, name in scripts.items()}
+    finally:
+        tree.cleanup()
+
+    print("%-8s %10s %12s %12s %10s" % ("section", "size KiB", "current ms", "baseline ms", "output"))
+    for name, _, old in SECTIONS:
+        if name not in args.sections:
+            continue
+        port, version = (old_cluster.master.port, OLD_MASTER_VERSION) if old else (cluster.master.port, MASTER_VERSION)
+        results = {variant: best_time(renderer(mfs, name, port, version), args.repeat)
+                   for variant, mfs in loaded.items()}
+        elapsed, page = results["current"]
+        if args.baseline:
+            baseline_elapsed, baseline_page = results["baseline"]
+            baseline = "%.1f" % (1000 * baseline_elapsed)
+            same = "same" if page == baseline_page else "DIFFERENT"
+        else:
+            baseline = same = "-"
+        print("%-8s %10.0f %12.1f %12s %10s" % (name, len(page) / 1024, 1000 * elapsed, baseline, same))
+
+    cluster.close()
+    old_cluster.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+"""Helpers shared by the CGI benchmarks.
+
+The benchmarks work on the sources from src/cgi: the *.in files are configured
+into a temporary document root (the same substitutions CMake does) and
+lizardfs-cgiserver is started from there as a separate process, so that its
+measurements are not disturbed by the load generator.
+
+Instead of a real cluster the scripts talk to FakeCluster: a fake master and
+fake chunkservers answering the requests of mfs.cgi and chart.cgi with
+synthetic data of the given size, optionally after a delay.
+"""
+
+import os
+import runpy
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from typing import Callable, Dict, List, Optional, Tuple
+
+SOURCE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "src", "cgi"
+)
+STATIC_FILES = ["err.gif", "favicon.ico", "help.html", "index.html", "logomini.png", "mfs.css"]
+CGI_SCRIPTS = ["mfs.cgi", "chart.cgi"]
+
+PROTO_BASE = 0
+CHARTS_CSV_CHARTID_BASE = 90000
+
+CLTOMA_CSERV_LIST = PROTO_BASE + 500
+CUTOAN_CHART = PROTO_BASE + 504
+ANTOCU_CHART = PROTO_BASE + 505
+CLTOMA_SESSION_LIST = PROTO_BASE + 508
+CLTOMA_INFO = PROTO_BASE + 510
+CLTOMA_FSTEST_INFO = PROTO_BASE + 512
+CLTOMA_CHUNKSTEST_INFO = PROTO_BASE + 514
+CLTOMA_CHUNKS_MATRIX = PROTO_BASE + 516
+CLTOMA_EXPORTS_INFO = PROTO_BASE + 520
+CLTOMA_MLOG_LIST = PROTO_BASE + 522
+CLTOCS_HDD_LIST_V2 = PROTO_BASE + 600
+LIZ_CLTOMA_METADATASERVERS_LIST = 1522
+LIZ_CLTOMA_CHUNKS_HEALTH = 1526
+LIZ_CLTOMA_METADATASERVER_STATUS = 1545
+LIZ_CLTOMA_LIST_GOALS = 1547
+LIZ_CLTOMA_CSERV_LIST = 1549
+LIZ_CLTOMA_HOSTNAME = 1551
+
+
+def configure(source: str, destination: str, substitutions: Dict[str, str]) -> None:
+    """Copies a *.in file replacing @VARIABLES@ the way CMake's configure_file does"""
+
+    with open(source) as f:
+        text = f.read()
+    for name, value in substitutions.items():
+        text = text.replace("@%s@" % name, value)
+    with open(destination, "w") as f:
+        f.write(text)
+    os.chmod(destination, 0o755)
+
+
+class ConfiguredTree:
+    """A temporary directory holding configured CGI scripts and the server.
+    server_source may point to another version of lizardfs-cgiserver.py.in,
+    e.g. extracted with git show, to compare it with the current one."""
+
+    def __init__(self, server_source: Optional[str] = None) -> None:
+        self.directory = tempfile.mkdtemp(prefix="lizardfs-cgi-bench-")
+        self.root = os.path.join(self.directory, "root")
+        self.server = os.path.join(self.directory, "lizardfs-cgiserver.py")
+        os.mkdir(self.root)
+        self.substitutions = {
+            "PROTO_BASE": str(PROTO_BASE),
+            "CHARTS_CSV_CHARTID_BASE": str(CHARTS_CSV_CHARTID_BASE),
+            "CGI_PATH": self.root,
+        }
+        for name in CGI_SCRIPTS:
+            self.add_script(name, os.path.join(SOURCE_DIR, name + ".in"))
+        configure(
+            server_source or os.path.join(SOURCE_DIR, "lizardfs-cgiserver.py.in"),
+            self.server,
+            self.substitutions,
+        )
+        for name in STATIC_FILES:
+            shutil.copy(os.path.join(SOURCE_DIR, name), self.root)
+
+    def add_script(self, name: str, source: str) -> None:
+        """Configures a CGI script from source into the document root as name,
+        e.g. another version of mfs.cgi.in to compare with the current one"""
+        configure(source, os.path.join(self.root, name), self.substitutions)
+
+    def load_script(self, name: str) -> Dict[str, object]:
+        """Loads a CGI script the way lizardfs-cgiserver does in persistent
+        mode and returns its globals"""
+        return runpy.run_path(os.path.join(self.root, name), run_name="__cgi__")
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def server_rss_kib(pid: int, field: str = "VmRSS") -> int:
+    """Resident memory of a process (or its peak with field="VmHWM") in KiB"""
+    with open("/proc/%d/status" % pid) as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def free_port() -> int:
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+class CGIServerProcess:
+    """lizardfs-cgiserver started from a configured tree with the given options"""
+
+    def __init__(self, tree: ConfiguredTree, options: Optional[List[str]] = None) -> None:
+        self.port = free_port()
+        self.process = subprocess.Popen(
+            [sys.executable, tree.server, "-H", "127.0.0.1", "-P", str(self.port),
+             "-R", tree.root] + (options or []),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.time() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline or self.process.poll() is not None:
+                    self.stop()
+                    raise RuntimeError("lizardfs-cgiserver did not start")
+                time.sleep(0.05)
+
+    def url(self, path: str) -> str:
+        return "http://127.0.0.1:%u/%s" % (self.port, path)
+
+    def get(self, path: str) -> bytes:
+        with urllib.request.urlopen(self.url(path)) as response:
+            return response.read()
+
+    def stop(self) -> None:
+        self.process.terminate()
+        self.process.wait()
+
+
+# Handler gets the command and its payload and returns the whole reply
+# (header included) or None to close the connection
+MessageHandler = Callable[[int, bytes], Optional[bytes]]
+
+
+def reply(command: int, data: bytes) -> bytes:
+    """Packet in the legacy format: command and length followed by data"""
+    return struct.pack(">LL", command, len(data)) + data
+
+
+def lizardfs_reply(command: int, data: bytes, version: int = 0) -> bytes:
+    """Packet in the LizardFS format, with the packet version before data"""
+    return struct.pack(">LLL", command, len(data) + 4, version) + data
+
+
+def _recv_exactly(connection: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise EOFError
+        data += chunk
+    return data
+
+
+class FakeServer:
+    """Threaded TCP server speaking the master/chunkserver framing.
+    Each incoming packet is passed to the handler, optionally after a delay
+    which emulates network and processing latency of a real server."""
+
+    def __init__(self, handler: MessageHandler, latency: float = 0.0, port: int = 0) -> None:
+        self.handler = handler
+        self.latency = latency
+        self.requests = 0
+        self.socket = socket.socket()
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(("127.0.0.1", port))
+        self.socket.listen(128)
+        self.port = self.socket.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                connection, _ = self.socket.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection: socket.socket) -> None:
+        try:
+            while True:
+                command, length = struct.unpack(">LL", _recv_exactly(connection, 8))
+                payload = _recv_exactly(connection, length) if length else b""
+                self.requests += 1
+                if self.latency:
+                    time.sleep(self.latency)
+                answer = self.handler(command, payload)
+                if answer is None:
+                    break
+                connection.sendall(answer)
+        except (OSError, EOFError):
+            pass
+        connection.close()
+
+    def close(self) -> None:
+        self.socket.close()
+
+
+def percentiles(samples: List[float], points: Tuple[int, ...] = (50, 99)) -> Dict[int, float]:
+    ordered = sorted(samples)
+    return {
+        p: ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in points
+    }
+
+
+def ip(i: int) -> Tuple[int, int, int, int]:
+    return (10, (i >> 16) & 255, (i >> 8) & 255, i & 255)
+
+
+def string(text: bytes) -> bytes:
+    return struct.pack(">L", len(text) + 1) + text + b"\0"
+
+
+def dictionary(entries: Dict[int, Tuple[int, ...]], value_format: str) -> bytes:
+    return struct.pack(">L", len(entries)) + b"".join(
+        struct.pack(">B" + value_format, key, *values) for key, values in entries.items())
+
+
+class FakeCluster:
+    """Replies of a fake master and of fake chunkservers describing a synthetic
+    cluster: the given numbers of chunkservers, disks of each of them, mounts
+    and exports, with the master reporting the given version.
+
+    The list of chunkservers (section CS) and mounts hold synthetic addresses
+    from 10.0.0.0/8, or 127.0.0.1 if distinct_addresses is False, so that
+    mfs.cgi doesn't wait for reverse DNS lookups. The chunkservers asked for
+    their disks (section HD) are the fake ones started by start(). Charts are served by all of them, CSV
+    charts (ids above CHARTS_CSV_CHARTID_BASE) with a day of samples.
+    Replies are generated once, so that the fake servers answer quickly."""
+
+    png = b"\x89PNG\x0d\x0a\x1a\x0a" + bytes(2048)
+    chart_samples = 24 * 60
+
+    def __init__(self, chunkservers: int = 100, disks_per_server: int = 100, sessions: int = 100,
+                 exports: int = 100, version: Tuple[int, int, int] = (3, 13, 0),
+                 distinct_addresses: bool = True) -> None:
+        self.rows = chunkservers
+        self.disks_per_server = disks_per_server
+        self.session_count = sessions
+        self.export_count = exports
+        self.version = version
+        self.distinct_addresses = distinct_addresses
+        self.chunkserver_ports: List[int] = []
+        self.replies: Dict[Tuple[str, int, bytes], Optional[bytes]] = {}
+        self.master: Optional[FakeServer] = None
+        self.servers: List[FakeServer] = []
+
+    def start(self, disk_servers: int, latency: float = 0.0) -> None:
+        """Starts the master and disk_servers chunkservers, each answering after latency seconds"""
+        self.servers = [FakeServer(self.cached("cs%u" % i, self.chunkserver(i)), latency)
+                        for i in range(disk_servers)]
+        self.chunkserver_ports = [server.port for server in self.servers]
+        self.master = FakeServer(self.cached("master", self.master_handler), latency)
+        self.servers.append(self.master)
+
+    def close(self) -> None:
+        for server in self.servers:
+            server.close()
+
+    def cached(self, server: str, handler: MessageHandler) -> MessageHandler:
+        def reply_once(command: int, payload: bytes) -> Optional[bytes]:
+            key = (server, command, payload)
+            if key not in self.replies:
+                self.replies[key] = handler(command, payload)
+            return self.replies[key]
+        return reply_once
+
+    def ip(self, i: int) -> Tuple[int, int, int, int]:
+        return ip(i) if self.distinct_addresses else (127, 0, 0, 1)
+
+    def info(self) -> bytes:
+        total = self.rows * 10 ** 12
+        if self.version < (1, 6, 0):
+            # 60 bytes long, without the version
+            return struct.pack(">QQQQLQLLLL", 10 ** 9, total, total // 2, 1000, 3, 2000, 4,
+                               self.session_count, 10, 80)
+        return struct.pack(">HBBQQQQLQLLLLLLL", *self.version, 10 ** 9, total, total // 2, 1000, 3, 2000, 4,
+                           self.session_count, 10, 80, self.rows * 1000, 1500, 1400)
+
+    def chunkservers(self) -> bytes:
+        entries = []
+        for i in range(self.rows):
+            label = b"rack%u" % (i % 10)
+            total = 0 if i % 50 == 0 else 10 ** 12
+            entries.append(struct.pack(
+                ">BBBBBBBBHQQLQQLLL", 1 if i % 97 == 0 else 0, 3, 12, i % 3, *self.ip(i), 9422,
+                i * 10 ** 7, total, i * 13, i * 10 ** 5, 10 ** 10 if i % 7 else 0, i, 0,
+                len(label) + 1) + label + b"\0")
+        return struct.pack(">LL", 0, self.rows) + b"".join(entries)
+
+    def disk_servers(self) -> bytes:
+        return b"".join(struct.pack(">BBBBBBBBHQQLQQLL", 0, 3, 12, 0, 127, 0, 0, 1, port, 0, 0, 0, 0, 0, 0, 0)
+                        for port in self.chunkserver_ports)
+
+    def disks(self, server: int) -> bytes:
+        entries = []
+        for i in range(self.disks_per_server):
+            path = b"/mnt/hd%03u/" % i
+            number = server * self.disks_per_server + i
+            entry = struct.pack(">B", len(path)) + path + struct.pack(
+                ">BQLQQL", (0, 0, 0, 1, 2, 4)[number % 6], number if number % 9 == 0 else 0,
+                1500000000 + number if number % 9 == 0 else 0, number * 10 ** 8 % 10 ** 12,
+                0 if number % 11 == 0 else 10 ** 12, number * 3)
+            for period in range(3):
+                if number % 5 == 0:
+                    entry += bytes(64)
+                else:
+                    entry += struct.pack(">QQQQQLLLLLL", number * 2 ** 20, number * 2 ** 19, number * 1000 + 1,
+                                         number * 700 + 1, number * 50, number * 16, number * 8, number,
+                                         1000 + period, 2000 + period, 3000 + period)
+            entries.append(struct.pack(">H", len(entry)) + entry)
+        return b"".join(entries)
+
+    def exports(self) -> bytes:
+        entries = []
+        for i in range(self.export_count):
+            path = b"." if i % 100 == 0 else b"/export/e%u" % i
+            first = self.ip(i)
+            entries.append(struct.pack(">BBBBBBBBL", *first, *(first[:3] + (255,)), len(path)) + path + struct.pack(
+                ">HBBBBLLLLBBLL", 3, 12, 0, i % 4, i % 32, i % 1000, i % 100, 999, 999,
+                1 if i % 3 else 2, 20 if i % 3 else 5, 0, 0xFFFFFFFF if i % 4 else 86400 * (i % 30)))
+        return b"".join(entries)
+
+    def sessions(self, parameters: bool) -> bytes:
+        if self.version < (1, 5, 14):
+            return b"".join(struct.pack(">BBBBBBBB32L", *self.ip(i), 0, 1, 5, 13, *((i * 7 + k) % 1000 for k in range(32)))
+                            for i in range(self.session_count))
+        entries = [struct.pack(">H", 16)]
+        for i in range(self.session_count):
+            info = b"/mnt/client%u" % i
+            path = b"." if i % 100 == 0 else b"/"
+            entry = struct.pack(">LBBBBHBBL", i + 1, *self.ip(i), 3, 12, 0, len(info)) + info + struct.pack(">L", len(path)) + path
+            if parameters:
+                entry += struct.pack(">BLLLLBBLL", i % 32, i % 1000, i % 100, 999, 999,
+                                     1 if i % 3 else 2, 20 if i % 3 else 5, 0, 0xFFFFFFFF if i % 4 else 3600 * (i % 50))
+            else:
+                entry += struct.pack(">BLLLL", i % 32, i % 1000, i % 100, 999, 999)
+            entry += struct.pack(">32L", *((i * 7 + k) % 1000 for k in range(32)))
+            entries.append(entry)
+        return b"".join(entries)
+
+    @staticmethod
+    def goals() -> bytes:
+        return (struct.pack(">L", 2) + struct.pack(">H", 1) + string(b"1") + string(b"1*_") +
+                struct.pack(">H", 2) + string(b"two") + string(b"1*_,1*ssd"))
+
+    def chunks_health(self, payload: bytes) -> bytes:
+        chunks = self.rows * 1000
+        return (payload[-1:] + dictionary({1: (chunks // 2,), 2: (chunks // 2,)}, "Q") +
+                dictionary({2: (chunks // 100,)}, "Q") + dictionary({2: (3,)}, "Q") +
+                dictionary({2: tuple(chunks // (100 << k) for k in range(11))}, "11Q") +
+                dictionary({1: tuple(k for k in range(11))}, "11Q"))
+
+    def chart(self, payload: bytes) -> bytes:
+        chart_id, = struct.unpack(">L", payload)
+        if chart_id <= CHARTS_CSV_CHARTID_BASE:
+            return self.png
+        end = int(time.time()) // 60 * 60
+        return b"timestamp,,,\n" + b"".join(
+            b"%u,%u,%u,%u,\n" % (end - 60 * k, k, 2 * k, 3 * k) for k in range(self.chart_samples, 0, -1))
+
+    def master_handler(self, command: int, payload: bytes) -> Optional[bytes]:
+        if command == CLTOMA_INFO:
+            return reply(command + 1, self.info())
+        if command == LIZ_CLTOMA_CSERV_LIST:
+            return reply(command + 1, self.chunkservers())
+        if command == CLTOMA_CSERV_LIST:
+            return reply(command + 1, self.disk_servers())
+        if command == CLTOMA_EXPORTS_INFO:
+            return reply(command + 1, self.exports())
+        if command == CLTOMA_SESSION_LIST:
+            return reply(command + 1, self.sessions(len(payload) > 0))
+        if command == CLTOMA_MLOG_LIST:
+            return reply(command + 1, b"")
+        if command == CLTOMA_CHUNKS_MATRIX:
+            return reply(command + 1, struct.pack(">121L", *((i * 7) % 11 for i in range(121))))
+        if command == CLTOMA_CHUNKSTEST_INFO:
+            return reply(command + 1, struct.pack(">13L", 1600000000, 1600000100, *range(1, 12)))
+        if command == CLTOMA_FSTEST_INFO:
+            return reply(command + 1, struct.pack(">9L", 1600000000, 1600000100, 10, 1, 0, 20, 2, 0, 0))
+        if command == LIZ_CLTOMA_LIST_GOALS:
+            return lizardfs_reply(command + 1, self.goals())
+        if command == LIZ_CLTOMA_CHUNKS_HEALTH:
+            return lizardfs_reply(command + 1, self.chunks_health(payload))
+        if command == LIZ_CLTOMA_METADATASERVERS_LIST:
+            return lizardfs_reply(command + 1, struct.pack(">LLLHHBB", 0, 1, 0x7f000001, 0, *self.version))
+        if command == LIZ_CLTOMA_METADATASERVER_STATUS:
+            return lizardfs_reply(command + 1, struct.pack(">LBQ", 0, 1, 4242))
+        if command == LIZ_CLTOMA_HOSTNAME:
+            return lizardfs_reply(command + 1, string(b"fakemaster"))
+        if command == CUTOAN_CHART:
+            return reply(ANTOCU_CHART, self.chart(payload))
+        return None
+
+    def chunkserver(self, server: int) -> MessageHandler:
+        def handler(command: int, payload: bytes) -> Optional[bytes]:
+            if command == CLTOCS_HDD_LIST_V2:
+                return reply(command + 1, self.disks(server))
+            if command == CUTOAN_CHART:
+                return reply(ANTOCU_CHART, self.chart(payload))
+            return None
+        return handler
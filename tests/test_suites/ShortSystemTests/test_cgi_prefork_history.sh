@@ -0,0 +1,23 @@
+timeout_set 2 minutes
+assert_program_installed wget
+
+CHUNKSERVERS=1 \
+	USE_RAMDISK="YES" \
+	setup_local_empty_lizardfs info
+
+# A CGI server with 3 worker processes, one of which collects the history of metrics of the master
+cgi_pidfile="$TEMP_DIR/lizardfs-cgiserver-prefork.pid"
+get_next_port_number cgi_port
+lizardfs-cgiserver -P "$cgi_port" -p "$cgi_pidfile" -f 3 -S "$RAMDISK_DIR/cgi_history" \
+		-M "localhost:${info[matocl]}" -I 1
+history_url="http://localhost:$cgi_port/mfs.cgi?format=history"
+
+# Wait for the first samples of the metrics
+assert_eventually_matches '"series": \["' "wget -q -O - '$history_url'"
+
+# Every worker (each request is sent over a new connection) has to find the history
+for i in {1..30}; do
+	MESSAGE="Request $i for the history" assert_success wget -q -O /dev/null "$history_url"
+done
+
+kill "$(cat "$cgi_pidfile")"